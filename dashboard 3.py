@@ -3,72 +3,162 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+DATA_PATH = "channel_daily_data.csv"
+COUNT_COLS = ['uv', 'pv', 'orders', 'clicks', 'impressions']
+SUM_COLS = ['uv', 'pv', 'gmv', 'cost', 'orders', 'clicks', 'impressions']
+
+
+# 假设读取CSV或数据库数据（缓存，避免每次交互重新解析文件；使用 pyarrow 多线程解析）
+# 渠道为低基数维度，读入时即转为 category，加快后续 groupby 的哈希
+@st.cache_data(ttl=3600)
+def load_df(path):
+    df = pd.read_csv(path, engine="pyarrow", parse_dates=['date'], dtype={'channel': 'category'})
+    # 计数列按取值范围压缩为无符号小整型，减少聚合时搬运的字节；金额列保持 float64，不损失精度
+    for c in COUNT_COLS:
+        df[c] = pd.to_numeric(df[c], downcast='unsigned')
+    # 商品名前缀视为品类，读入时一次算好，按日期筛选后直接沿用
+    product_name = df['product_name']
+    df['category'] = product_name.str.split('_', n=1).str[0].where(
+        product_name.str.contains('_', regex=False), 'Unknown'
+    ).astype('category')
+    # 按日期排好序，筛选时间范围时可直接二分切片
+    return df.sort_values('date', kind='stable', ignore_index=True)
+
+
+@st.cache_data(ttl=3600)
+def get_channels(path):
+    return tuple(load_df(path)['channel'].unique())
+
+
+# 以下聚合均按数据路径与时间范围缓存，仅切换渠道等控件时不再重复 groupby
+@st.cache_data(ttl=3600)
+def filter_by_date(path, start_date, end_date):
+    df = load_df(path)
+    lo = df['date'].searchsorted(pd.to_datetime(start_date), side='left')
+    hi = df['date'].searchsorted(pd.to_datetime(end_date), side='right')
+    return df.iloc[lo:hi]
+
+
+# 最细粒度（渠道 × SKU × 日期，品类随 SKU 确定）只扫描一次明细，其余汇总表都在这张小表上二次聚合
+@st.cache_data(ttl=3600)
+def get_base(path, start_date, end_date):
+    df_filtered = filter_by_date(path, start_date, end_date)
+    base = df_filtered.groupby(
+        ['channel', 'product_id', 'product_name', 'category', 'date'], sort=False, observed=True
+    )[SUM_COLS + ['gross_profit']].sum().reset_index()
+    # groupby sum 会在结果放得下时退回输入的小整型，这里统一为 int64，下游 dtype 不随数据变化
+    base[COUNT_COLS] = base[COUNT_COLS].astype('int64')
+    return base
+
+
+@st.cache_data(ttl=3600)
+def get_channel_sku_summary(path, start_date, end_date):
+    base = get_base(path, start_date, end_date)
+    channel_sku_summary = base.groupby(['channel', 'product_id', 'product_name'], sort=False, observed=True)[SUM_COLS].sum().reset_index()
+    channel_sku_summary['转化率(CVR)'] = channel_sku_summary['orders'] / channel_sku_summary['clicks']
+    channel_sku_summary['ROI'] = channel_sku_summary['gmv'] / channel_sku_summary['cost']
+    return channel_sku_summary
+
+
+@st.cache_data(ttl=3600)
+def get_product_roi(path, start_date, end_date):
+    base = get_base(path, start_date, end_date)
+    product_roi = base.groupby(['product_id', 'product_name'], sort=False, observed=True)[['gmv', 'cost']].sum().reset_index()
+    product_roi['ROI'] = product_roi['gmv'] / product_roi['cost']
+    return product_roi
+
+
+@st.cache_data(ttl=3600)
+def get_channel_summary(path, start_date, end_date):
+    base = get_base(path, start_date, end_date)
+    channel_summary = base.groupby('channel', sort=False, observed=True)[SUM_COLS + ['gross_profit']].sum().reset_index()
+    channel_summary['转化率(CVR)'] = channel_summary['orders'] / channel_summary['clicks']
+    channel_summary['ROI'] = channel_summary['gmv'] / channel_summary['cost']
+    channel_summary['全段ROI'] = channel_summary['gmv'] / (channel_summary['cost'] + channel_summary['gross_profit'])
+    channel_summary['GMV占比'] = channel_summary['gmv'] / channel_summary['gmv'].sum()
+    return channel_summary
+
+
+@st.cache_data(ttl=3600)
+def get_combo(path, start_date, end_date):
+    base = get_base(path, start_date, end_date)
+    combo = base.groupby(['channel', 'category'], sort=False, observed=True).agg({'gmv': 'sum', 'cost': 'sum'}).reset_index()
+    combo['ROI'] = combo['gmv'] / combo['cost']
+    return combo
+
+
+# 渠道 × 日期日汇总只算一次，趋势图、边际ROI和费用异常共用
+@st.cache_data(ttl=3600)
+def get_channel_cost_roi(path, start_date, end_date):
+    base = get_base(path, start_date, end_date)
+    # ROI 在前端由 Altair transform_calculate 计算，这里只保留加总指标
+    return base.groupby(['channel', 'date'], sort=False, observed=True).agg({'uv': 'sum', 'cost': 'sum', 'gmv': 'sum'}).reset_index()
+
+
+@st.cache_data(ttl=3600)
+def get_cost_merged(path, start_date, end_date):
+    cost_merged = get_channel_cost_roi(path, start_date, end_date)[['date', 'channel', 'cost']].copy()
+    cost_merged['mean_cost'] = cost_merged.groupby('channel', sort=False, observed=True)['cost'].transform('mean')
+    cost_merged['异常程度'] = cost_merged['cost'] / cost_merged['mean_cost']
+    return cost_merged
+
+
 st.title("渠道销售分析数据看板")
 
-# 假设读取CSV或数据库数据
-df = pd.read_csv("channel_daily_data.csv", parse_dates=['date'])
+df = load_df(DATA_PATH)
 
 # 筛选时间范围
 start_date = st.date_input("开始日期", df['date'].min())
 end_date = st.date_input("结束日期", df['date'].max())
-df_filtered = df[(df['date'] >= pd.to_datetime(start_date)) & (df['date'] <= pd.to_datetime(end_date))]
 
 # 聚合渠道指标（含SKU维度）
-channel_sku_summary = df_filtered.groupby(['channel', 'product_id', 'product_name']).agg({
-    'uv': 'sum', 'pv': 'sum', 'gmv': 'sum', 'cost': 'sum',
-    'orders': 'sum', 'clicks': 'sum', 'impressions': 'sum'
-}).reset_index()
-channel_sku_summary['转化率(CVR)'] = channel_sku_summary['orders'] / channel_sku_summary['clicks']
-channel_sku_summary['ROI'] = channel_sku_summary['gmv'] / channel_sku_summary['cost']
+channel_sku_summary = get_channel_sku_summary(DATA_PATH, start_date, end_date)
 
 st.subheader("各渠道-SKU维度汇总指标")
 st.dataframe(channel_sku_summary)
 
 # 趋势图：每日UV、GMV、ROI per 渠道
+# 渠道切换为 Vega-Lite 下拉参数，在浏览器端筛选，不触发 Streamlit 重跑
 st.subheader("每日趋势")
-selected_channel = st.selectbox("选择渠道查看趋势", df['channel'].unique())
-df_daily = df_filtered[df_filtered['channel'] == selected_channel].groupby('date').agg({
-    'uv': 'sum', 'gmv': 'sum', 'cost': 'sum'
-}).reset_index()
-df_daily['ROI'] = df_daily['gmv'] / df_daily['cost']
-
-df_melted = df_daily.melt(id_vars='date', value_vars=['uv', 'gmv', 'ROI'], var_name='指标', value_name='值')
-chart = alt.Chart(df_melted).mark_line().encode(
+channel_cost_roi = get_channel_cost_roi(DATA_PATH, start_date, end_date)
+channel_options = list(get_channels(DATA_PATH))
+# 使用普通变量参数而非 selection，点击图表不会清空筛选；参数需固定命名，
+# 否则 Streamlit 稳定化 spec 时只改写参数声明、不改写筛选表达式里的引用
+trend_channel = alt.param(
+    name="trend_channel", value=channel_options[0],
+    bind=alt.binding_select(options=channel_options, name="选择渠道查看趋势 ")
+)
+chart = alt.Chart(channel_cost_roi).transform_filter(alt.datum.channel == trend_channel).transform_calculate(
+    ROI='datum.gmv / datum.cost'
+).transform_fold(
+    ['uv', 'gmv', 'ROI'], as_=['指标', '值']
+).mark_line().encode(
     x='date:T', y='值:Q', color='指标:N', tooltip=['date:T', '指标:N', '值:Q']
-).properties(title=f"每日趋势 - {selected_channel}", width=700)
+).add_params(trend_channel).properties(title="每日趋势（按所选渠道）", width=700)
 st.altair_chart(chart, use_container_width=True)
 
 # ROI 边际效应分析（ROI 随费用变化）
 st.subheader("边际ROI分析")
-channel_cost_roi = df_filtered.groupby(['channel', 'date']).agg({'cost': 'sum', 'gmv': 'sum'}).reset_index()
-channel_cost_roi['ROI'] = channel_cost_roi['gmv'] / channel_cost_roi['cost']
-selected_marginal_channel = st.selectbox("选择渠道分析ROI边际变化", df['channel'].unique())
-marginal_df = channel_cost_roi[channel_cost_roi['channel'] == selected_marginal_channel]
-
-marginal_chart = alt.Chart(marginal_df).mark_circle(size=80).encode(
+marginal_channel = alt.param(
+    name="marginal_channel", value=channel_options[0],
+    bind=alt.binding_select(options=channel_options, name="选择渠道分析ROI边际变化 ")
+)
+marginal_chart = alt.Chart(channel_cost_roi).transform_filter(alt.datum.channel == marginal_channel).transform_calculate(
+    ROI='datum.gmv / datum.cost'
+).mark_circle(size=80).encode(
     x='cost:Q', y='ROI:Q', tooltip=['date:T', 'cost:Q', 'ROI:Q']
-).properties(title=f"{selected_marginal_channel} 渠道 ROI vs 成本 (边际效应)", width=700)
+).add_params(marginal_channel).properties(title="所选渠道 ROI vs 成本 (边际效应)", width=700)
 st.altair_chart(marginal_chart, use_container_width=True)
 
 # Top10 ROI 产品
 st.subheader("Top10 ROI产品")
-product_roi = df_filtered.groupby(['product_id', 'product_name']).agg({
-    'gmv': 'sum', 'cost': 'sum'
-}).reset_index()
-product_roi['ROI'] = product_roi['gmv'] / product_roi['cost']
-top10 = product_roi.sort_values(by='ROI', ascending=False).head(10)
+product_roi = get_product_roi(DATA_PATH, start_date, end_date)
+top10 = product_roi.nlargest(10, 'ROI')
 st.dataframe(top10)
 
 # 渠道 GMV 占比
 st.subheader("渠道GMV占比")
-channel_summary = df_filtered.groupby('channel').agg({
-    'uv': 'sum', 'pv': 'sum', 'gmv': 'sum', 'cost': 'sum',
-    'orders': 'sum', 'clicks': 'sum', 'impressions': 'sum'
-}).reset_index()
-channel_summary['转化率(CVR)'] = channel_summary['orders'] / channel_summary['clicks']
-channel_summary['ROI'] = channel_summary['gmv'] / channel_summary['cost']
-channel_summary['全段ROI'] = channel_summary['gmv'] / (channel_summary['cost'] + df_filtered['gross_profit'].sum())
-channel_summary['GMV占比'] = channel_summary['gmv'] / channel_summary['gmv'].sum()
+channel_summary = get_channel_summary(DATA_PATH, start_date, end_date)
 
 pie_chart = alt.Chart(channel_summary).mark_arc().encode(
     theta='GMV占比:Q', color='channel:N', tooltip=['channel', 'GMV占比']
@@ -77,23 +167,18 @@ st.altair_chart(pie_chart, use_container_width=True)
 
 # 首推渠道选择器
 st.subheader("首推渠道设定")
-primary_channel = st.selectbox("请选择要主推的渠道：", channel_summary['channel'].unique())
+primary_channel = st.selectbox("请选择要主推的渠道：", sorted(channel_summary['channel']))
 st.success(f"当前主推渠道设定为：{primary_channel}")
 
 # 渠道+品类组合分析
-df_filtered['category'] = df_filtered['product_name'].apply(lambda x: x.split("_")[0] if '_' in x else 'Unknown')
-combo = df_filtered.groupby(['channel', 'category']).agg({'gmv': 'sum', 'cost': 'sum'}).reset_index()
-combo['ROI'] = combo['gmv'] / combo['cost']
+combo = get_combo(DATA_PATH, start_date, end_date)
 st.subheader("渠道+品类组合 ROI 分析")
 st.dataframe(combo.sort_values(by='ROI', ascending=False))
 
 # 费用异常归因与建议
 st.subheader("费用异常归因与优化建议")
-channel_cost_alert = df_filtered.groupby(['date', 'channel'])['cost'].sum().reset_index()
-cost_mean = channel_cost_alert.groupby('channel')['cost'].mean().reset_index(name='mean_cost')
-cost_merged = channel_cost_alert.merge(cost_mean, on='channel')
-cost_merged['异常程度'] = cost_merged['cost'] / cost_merged['mean_cost']
-cost_alerts = cost_merged.sort_values(by='异常程度', ascending=False).head(5)
+cost_merged = get_cost_merged(DATA_PATH, start_date, end_date)
+cost_alerts = cost_merged.nlargest(5, '异常程度')
 
 # 添加归因和建议
 cost_alerts['归因分析'] = "可能因高频投放、无效点击或预算外推"
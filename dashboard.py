@@ -3,30 +3,79 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly_resampler import FigureResampler
 from scipy.stats import beta, ttest_ind, norm
 
+
+# ---------------------
+# Cached statistics (recomputed only when the input arrays change)
+# ---------------------
+@st.cache_data
+def posterior_pdfs(conversions, visitors, x):
+    # One broadcast beta.pdf call: row i is the posterior of group i over x
+    a = conversions + 1
+    b = visitors - conversions + 1
+    return beta.pdf(x[None, :], a[:, None], b[:, None])
+
+
+@st.cache_data
+def bootstrap_diff(a, b, n_boot=3000, seed=42):
+    # Draw all resample indices as one (n_boot, n) matrix and average each row
+    rng = np.random.default_rng(seed)
+    idx_a = rng.integers(0, len(a), size=(n_boot, len(a)))
+    idx_b = rng.integers(0, len(b), size=(n_boot, len(b)))
+    return b[idx_b].mean(axis=1) - a[idx_a].mean(axis=1)
+
+
+@st.cache_data
+def welch_ttest(a, b):
+    t_stat, p_val = ttest_ind(a, b, equal_var=False)
+    return float(t_stat), float(p_val)
+
+
+# ---------------------
+# Chart helpers
+# ---------------------
+def line_by_group(frames, y):
+    # One go.Scatter per pre-split group, so Plotly Express never has to group df itself
+    fig = go.Figure()
+    for group, g in frames.items():
+        fig.add_trace(go.Scatter(x=g["date"], y=g[y], mode="lines+markers", name=group))
+    fig.update_layout(xaxis_title="date", yaxis_title=y, legend_title_text="group")
+    return FigureResampler(fig)
+
+
 # ---------------------
 # Simulate multi-group data
 # ---------------------
-np.random.seed(42)
-groups = ['A', 'B', 'C', 'D']
-days = pd.date_range("2024-01-01", periods=30)
-data = []
+@st.cache_data
+def simulate(groups, n_days=30, seed=42):
+    # Draw every (group, day) cell at once as a (groups x days) matrix
+    rng = np.random.default_rng(seed)
+    k = np.arange(len(groups))[:, None]
+    days = pd.date_range("2024-01-01", periods=n_days)
+    visitors = rng.integers(450, 550, size=(len(groups), n_days))
+    conversions = rng.binomial(visitors, 0.10 + 0.02 * k)  # Slightly increasing CR
+    revenue = conversions * rng.normal(5 + 2 * k, 1, size=visitors.shape)
+    retained = rng.binomial(conversions, 0.3 + 0.05 * k)
+
+    df = pd.DataFrame({
+        "date": np.tile(days, len(groups)),
+        "group": np.repeat(groups, n_days),
+        "visitors": visitors.ravel(),
+        "conversions": conversions.ravel(),
+        "revenue": revenue.ravel(),
+        "retained": retained.ravel(),
+    })
+    df["cr"] = df["conversions"] / df["visitors"]
+    df["arpu"] = df["revenue"] / df["visitors"]
+    df["retention_rate"] = df["retained"] / df["conversions"].replace(0, np.nan)
+    return df
 
-for group in groups:
-    base_cr = 0.10 + 0.02 * groups.index(group)  # Slightly increasing CR
-    base_arpu = 5 + 2 * groups.index(group)
-    for date in days:
-        visitors = np.random.randint(450, 550)
-        conversions = np.random.binomial(visitors, base_cr)
-        revenue = conversions * np.random.normal(base_arpu, 1)
-        retained = np.random.binomial(conversions, 0.3 + 0.05 * groups.index(group))
-        data.append([date, group, visitors, conversions, revenue, retained])
 
-df = pd.DataFrame(data, columns=["date", "group", "visitors", "conversions", "revenue", "retained"])
-df["cr"] = df["conversions"] / df["visitors"]
-df["arpu"] = df["revenue"] / df["visitors"]
-df["retention_rate"] = df["retained"] / df["conversions"].replace(0, np.nan)
+groups = ['A', 'B', 'C', 'D']
+df = simulate(groups)
+group_frames = dict(tuple(df.groupby("group", sort=False, observed=True)))
 
 # ---------------------
 # Page config
@@ -39,7 +88,7 @@ st.caption("Simulated data comparing Groups A, B, C, and D over 30 days. Include
 # Summary cards
 # ---------------------
 st.subheader("🧮 Summary Metrics")
-summary = df.groupby("group").agg(
+summary = df.groupby("group", sort=False, observed=True).agg(
     total_visitors=("visitors", "sum"),
     total_conversions=("conversions", "sum"),
     total_revenue=("revenue", "sum"),
@@ -53,23 +102,25 @@ st.dataframe(summary.style.format("{:.2%}", subset=["CR", "Retention"]).format("
 
 # ---------------------
 # Conversion Rate Over Time
+# (daily time series are wrapped in FigureResampler, which LTTB-downsamples
+#  long traces to a fixed number of points before they are sent to the browser)
 # ---------------------
 st.subheader("📈 Daily Conversion Rate by Group")
-fig_cr = px.line(df, x="date", y="cr", color="group", markers=True)
+fig_cr = line_by_group(group_frames, "cr")
 st.plotly_chart(fig_cr, use_container_width=True)
 
 # ---------------------
 # ARPU Over Time
 # ---------------------
 st.subheader("💰 Daily ARPU by Group")
-fig_arpu = px.line(df, x="date", y="arpu", color="group", markers=True)
+fig_arpu = line_by_group(group_frames, "arpu")
 st.plotly_chart(fig_arpu, use_container_width=True)
 
 # ---------------------
 # Retention Over Time
 # ---------------------
 st.subheader("🔁 Daily Retention Rate by Group")
-fig_ret = px.line(df, x="date", y="retention_rate", color="group", markers=True)
+fig_ret = line_by_group(group_frames, "retention_rate")
 st.plotly_chart(fig_ret, use_container_width=True)
 
 # ---------------------
@@ -85,16 +136,13 @@ st.plotly_chart(fig_box, use_container_width=True)
 st.subheader("🧠 Bayesian Posterior: Group A vs Others")
 posterior_x = np.linspace(0.05, 0.25, 500)
 fig_bayes = go.Figure()
-a_conv = df[df.group == 'A']["conversions"].sum()
-a_total = df[df.group == 'A']["visitors"].sum()
-posterior_a = beta(a_conv + 1, a_total - a_conv + 1)
-fig_bayes.add_trace(go.Scatter(x=posterior_x, y=posterior_a.pdf(posterior_x), name="A"))
-
-for group in ['B', 'C', 'D']:
-    g_conv = df[df.group == group]["conversions"].sum()
-    g_total = df[df.group == group]["visitors"].sum()
-    posterior = beta(g_conv + 1, g_total - g_conv + 1)
-    fig_bayes.add_trace(go.Scatter(x=posterior_x, y=posterior.pdf(posterior_x), name=group))
+posterior_y = posterior_pdfs(
+    summary.loc[groups, "total_conversions"].to_numpy(),
+    summary.loc[groups, "total_visitors"].to_numpy(),
+    posterior_x
+)
+for group, pdf in zip(groups, posterior_y):
+    fig_bayes.add_trace(go.Scatter(x=posterior_x, y=pdf, name=group))
 
 st.plotly_chart(fig_bayes, use_container_width=True)
 
@@ -102,11 +150,9 @@ st.plotly_chart(fig_bayes, use_container_width=True)
 # Bootstrap uplift A vs B
 # ---------------------
 st.subheader("🎲 Bootstrap Uplift: A vs B")
-a_cr = df[df.group == "A"]["cr"]
-b_cr = df[df.group == "B"]["cr"]
-boot_diffs = [np.mean(np.random.choice(b_cr, size=len(b_cr), replace=True)) -
-              np.mean(np.random.choice(a_cr, size=len(a_cr), replace=True))
-              for _ in range(3000)]
+a_cr = df[df.group == "A"]["cr"].to_numpy()
+b_cr = df[df.group == "B"]["cr"].to_numpy()
+boot_diffs = bootstrap_diff(a_cr, b_cr)
 ci = np.percentile(boot_diffs, [2.5, 97.5])
 fig_boot = px.histogram(boot_diffs, nbins=50, title="Bootstrap Uplift Distribution (B - A)")
 fig_boot.add_vline(x=ci[0], line=dict(color="red", dash="dash"))
@@ -117,7 +163,7 @@ st.plotly_chart(fig_boot, use_container_width=True)
 # Welch’s t-test A vs B
 # ---------------------
 st.subheader("🧪 Welch’s T-Test (A vs B)")
-t_stat, p_val = ttest_ind(a_cr, b_cr, equal_var=False)
+t_stat, p_val = welch_ttest(a_cr, b_cr)
 st.write(f"**T-Statistic:** {t_stat:.3f}")
 st.write(f"**P-Value:** {p_val:.5f}")
 if p_val < 0.05: